@@ -14,6 +14,7 @@ Main features:
 
 Basic use:
     python pip-upgrader.py [--requirements file] [--quiet] [--dry-run] [--skip-pip]
+                           [--in-process]
 
 Simple example:
     python pip-upgrader.py --dry-run
@@ -24,18 +25,46 @@ License: MIT
 
 import subprocess
 import sys
-import platform
 import argparse
+import contextlib
+import io
 import logging
-from typing import Dict, List, Optional
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from pathlib import Path
-from datetime import datetime
+
+try:
+    from importlib.metadata import distributions
+except ImportError:  # Python < 3.8
+    from importlib_metadata import distributions
 
 # Check Python version
 if sys.version_info < (3, 6):
     print("Python 3.6 or higher is required")
     sys.exit(1)
 
+# Matches the "Would install name-1.0 other-2.0" line from pip --dry-run
+_WOULD_INSTALL_RE = re.compile(r"^Would install (.+)$", re.MULTILINE)
+
+# Splits a requirements line in one pass into either
+# a comment (1), a pinned "name[extra]==rest" (2, 3, 4) or anything else (5)
+_REQ_LINE_RE = re.compile(
+    r"^\s*(?:(#.*?)|([A-Za-z0-9_.-]+)(\s*(?:\[[^\]]*\])?\s*)==(.*?)|(.*?))\s*$"
+)
+
+# Matches a package name standing alone on its line in skip_packages.txt
+_SKIP_RE = re.compile(r"^\s*([A-Za-z0-9_.\-]+)\s*$", re.MULTILINE)
+
+# Matches a requirements line for pip itself, e.g. "pip", "PIP==23.0" or "pip>=22"
+_PIP_REQ_RE = re.compile(r"^\s*pip\s*(?:[\[<>=!~;@]|$)", re.IGNORECASE | re.MULTILINE)
+
 class PipUpgrader:
     """
     Main tool to update Python packages.
@@ -49,11 +78,12 @@ class PipUpgrader:
         requirements_file: Where to find package list
         quiet: Show less output
         dry_run: Just show what would change
+        in_process: Run pip without starting new processes
     """
     
     def __init__(
         self, requirements_file: str = "requirements.txt", quiet: bool = False,
-        dry_run: bool = False
+        dry_run: bool = False, in_process: bool = False
     ):
         """
         Initialize PipUpgrader with configuration options.
@@ -62,16 +92,24 @@ class PipUpgrader:
             requirements_file (str): Path to the requirements file
             quiet (bool): Whether to suppress detailed output
             dry_run (bool): Show proposed changes without executing them
+            in_process (bool): Run pip commands inside this process
         """
         self.requirements_file = Path(requirements_file).resolve()
         self.quiet = quiet
         self.dry_run = dry_run
-        self.is_windows = platform.system().lower() == "windows"
-        self.python_cmd = "python" if self.is_windows else "python3"
+        self.in_process = in_process
+        self._pip_prefix = (sys.executable, "-m", "pip")
+        self._skipped_packages: Optional[FrozenSet[str]] = None
         self.setup_logging()
 
-        if not self.requirements_file.exists():
-            raise FileNotFoundError(f"Requirements file not found: {requirements_file}")
+        # Fail before anything is changed, by opening rather than stat-ing
+        try:
+            with open(self.requirements_file, "r"):
+                pass
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"Requirements file not found: {requirements_file}"
+            ) from None
 
     def setup_logging(self) -> None:
         """Configure logging based on quiet mode."""
@@ -82,53 +120,96 @@ class PipUpgrader:
             datefmt="%Y-%m-%d %H:%M:%S",
         )
 
-    def get_skipped_packages(self) -> List[str]:
+    def get_skipped_packages(self) -> FrozenSet[str]:
         """
-        Read the skip_packages.txt file and return list of packages to skip.
+        Read the skip_packages.txt file and return set of packages to skip.
+
+        The file is only read once; later calls return the same set.
 
         Returns:
-            List[str]: List of package names to skip
+            FrozenSet[str]: Lowercase package names to skip
         """
+        if self._skipped_packages is None:
+            self._skipped_packages = self._read_skipped_packages()
+        return self._skipped_packages
+
+    def _read_skipped_packages(self) -> FrozenSet[str]:
+        """Parse skip_packages.txt into a set of lowercase package names."""
         skip_file = Path("skip_packages.txt")
         try:
-            if skip_file.exists():
-                return [
-                    line.strip()
-                    for line in skip_file.read_text().splitlines()
-                    if line.strip()
-                ]
-            return []
+            text = skip_file.read_text(encoding="utf-8")
+            return frozenset(name.lower() for name in _SKIP_RE.findall(text))
+        except FileNotFoundError:
+            return frozenset()
         except Exception as e:
             logging.error(f"Error reading skip_packages.txt: {e}")
-            return []
+            return frozenset()
 
-    def run_pip_command(self, command: str) -> subprocess.CompletedProcess:
+    def run_pip_command(self, args: List[str]) -> subprocess.CompletedProcess:
         """
         Safely run a pip command and handle errors.
 
+        Runs pip in this process when in_process is set, otherwise in a
+        subprocess.
+
         Args:
-            command (str): Pip command to run
+            args (List[str]): Arguments to pass to pip
 
         Returns:
             subprocess.CompletedProcess: Result of the command
         """
-        try:
-            # Make command platform-independent
-            if self.is_windows:
-                # Windows-specific command handling
-                command = command.replace("python -m pip", f"{self.python_cmd} -m pip")
-                shell = True
-            else:
-                # Unix-like systems
-                command = command.replace("python -m pip", f"{self.python_cmd} -m pip")
-                shell = False
+        if self.in_process:
+            return self._run_pip_captured(args)
+        return self._run_pip_subprocess(args)
+
+    def _run_pip_captured(self, args: List[str]) -> subprocess.CompletedProcess:
+        """
+        Run pip in this process and capture what it prints.
+
+        Args:
+            args (List[str]): Arguments to pass to pip
 
+        Returns:
+            subprocess.CompletedProcess: Result shaped like a subprocess run
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            exit_code = self._run_pip_in_process(args)
+
+        command = ["pip", *args]
+        if exit_code != 0:
+            error = subprocess.CalledProcessError(
+                exit_code, command, stdout.getvalue(), stderr.getvalue()
+            )
+            logging.error(f"Error running pip command: {error}")
+            logging.debug(f"Command output: {error.output}")
+            return error
+        return subprocess.CompletedProcess(
+            command, exit_code, stdout.getvalue(), stderr.getvalue()
+        )
+
+    def _run_pip_subprocess(self, args: List[str]) -> subprocess.CompletedProcess:
+        """
+        Run pip in a new process and handle errors.
+
+        Args:
+            args (List[str]): Arguments to pass to pip
+
+        Returns:
+            subprocess.CompletedProcess: Result of the command
+        """
+        try:
+            # Use the running interpreter's pip directly, with no shell.
+            # An absolute executable, close_fds=False and no cwd, env or
+            # preexec_fn let CPython 3.8+ start the child with posix_spawn
+            # instead of fork+exec. Our own fds are non-inheritable by
+            # default, so nothing extra leaks into pip.
             return subprocess.run(
-                command if shell else command.split(),
-                shell=shell,
+                [*self._pip_prefix, *args],
                 capture_output=True,
                 text=True,
-                check=True
+                check=True,
+                close_fds=False
             )
         except subprocess.CalledProcessError as e:
             logging.error(f"Error running pip command: {e}")
@@ -138,6 +219,75 @@ class PipUpgrader:
             logging.error(f"Unexpected error running pip command: {e}")
             raise
 
+    def _run_pip_in_process(self, args: List[str]) -> int:
+        """
+        Run pip inside this Python process instead of starting a new one.
+
+        Note: pip._internal is not a stable API and may change between
+        pip releases.
+
+        Args:
+            args (List[str]): Arguments to pass to pip
+
+        Returns:
+            int: Exit code from pip (non-zero on failure)
+        """
+        # pip sets up logging for itself, so put ours back afterwards
+        root_logger = logging.getLogger()
+        handlers, level = root_logger.handlers[:], root_logger.level
+        try:
+            from pip._internal.cli.main import main as pip_main
+            return pip_main(args)
+        except SystemExit as e:
+            # pip exits instead of returning on bad options
+            return e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            logging.error(f"Error running pip: {e}")
+            return 1
+        finally:
+            root_logger.handlers[:] = handlers
+            root_logger.setLevel(level)
+
+    def _get_pip_version(self) -> Tuple[int, int]:
+        """
+        Get the major and minor version of the pip this process would use.
+
+        Returns:
+            Tuple[int, int]: pip version, or (0, 0) if it can't be read
+        """
+        try:
+            from pip import __version__
+            match = re.match(r"(\d+)\.(\d+)", __version__)
+            return (int(match.group(1)), int(match.group(2)))
+        except Exception:
+            return (0, 0)
+
+    def _read_install_report(
+        self, report_file: Path, old_packages: Dict[str, str]
+    ) -> Dict[str, str]:
+        """
+        Work out the new package versions from a pip install report.
+
+        Args:
+            report_file (Path): JSON report written by pip install --report
+            old_packages (Dict[str, str]): Package versions before the upgrade
+
+        Returns:
+            Dict[str, str]: Package versions after the upgrade
+        """
+        try:
+            with open(report_file, "r", encoding="utf-8") as file:
+                report = json.load(file)
+        except (OSError, ValueError):
+            # No report (older pip), so look at what is installed now
+            return self.get_installed_packages()
+
+        new_packages = dict(old_packages)
+        for item in report.get("install", []):
+            metadata = item["metadata"]
+            new_packages[metadata["name"].lower()] = metadata["version"]
+        return new_packages
+
     def get_installed_packages(self) -> Dict[str, str]:
         """
         Get dictionary of installed packages and their versions.
@@ -145,18 +295,21 @@ class PipUpgrader:
         Returns:
             Dict[str, str]: Dictionary of package names and versions
         """
-        result = self.run_pip_command("pip freeze")
         packages = {}
-        for line in result.stdout.splitlines():
-            if "==" in line:
-                package, version = line.split("==")
-                packages[package.lower()] = version
+        # distributions() follows sys.path order, so the first match is the
+        # one that actually gets imported
+        for dist in distributions():
+            name = dist.metadata["Name"]
+            if name and name.lower() not in packages:
+                packages[name.lower()] = dist.version
         return packages
 
     def upgrade_pip_if_available(self) -> None:
         """Upgrade pip if a newer version is available."""
         logging.info("Checking if pip needs an upgrade...")
-        self.run_pip_command("python -m pip install --upgrade pip -q")
+        # Always a subprocess: pip can't safely replace itself while it
+        # is loaded in this process
+        self._run_pip_subprocess(["install", "--upgrade", "pip", "-q"])
         logging.info("Pip upgrade check complete.")
 
     def create_backup(self) -> Optional[str]:
@@ -166,21 +319,43 @@ class PipUpgrader:
         Returns:
             Optional[str]: Name of backup file if successful, None otherwise
         """
-        if self.requirements_file.exists():
-            backup_name = (
-                f"requirements_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            )
-            try:
-                import shutil
-                shutil.copy2(self.requirements_file, backup_name)
-                logging.info(f"Created backup: {backup_name}")
-                return backup_name
-            except Exception as e:
-                logging.error(f"Failed to create backup: {e}")
-                if not self.dry_run:
-                    raise  # Only raise if not in dry-run mode
-                return None
-        return None
+        backup_name = (
+            f"requirements_backup_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+        )
+        try:
+            self._copy_file(self.requirements_file, backup_name)
+            logging.info(f"Created backup: {backup_name}")
+            return backup_name
+        except Exception as e:
+            logging.error(f"Failed to create backup: {e}")
+            if not self.dry_run:
+                raise  # Only raise if not in dry-run mode
+            return None
+
+    def _copy_file(self, source, destination) -> None:
+        """
+        Copy file contents only, without timestamps or permissions.
+
+        Uses os.sendfile where the OS allows file-to-file copies (Linux),
+        so the data never passes through Python.
+
+        Args:
+            source: File to copy from
+            destination: File to copy to
+        """
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                offset = 0
+                while remaining > 0:
+                    sent = os.sendfile(dst.fileno(), src.fileno(), offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+        except (AttributeError, OSError):
+            # No os.sendfile (Windows) or no file-to-file support (macOS)
+            shutil.copyfile(source, destination)
 
     def upgrade_packages(self) -> None:
         """
@@ -202,7 +377,7 @@ class PipUpgrader:
             # Get skipped packages
             skipped_packages = self.get_skipped_packages()
             if skipped_packages:
-                logging.info(f"Skipping packages: {', '.join(skipped_packages)}")
+                logging.info(f"Skipping packages: {', '.join(sorted(skipped_packages))}")
 
             # Get current versions
             old_packages = self.get_installed_packages()
@@ -227,22 +402,45 @@ class PipUpgrader:
 
             # Upgrade packages
             logging.info("Upgrading packages...")
-            result = self.run_pip_command("pip install -r requirements.txt --upgrade")
-            if isinstance(result, subprocess.CalledProcessError):
-                self._restore_backup(backup_file)
-                logging.error("Package upgrade failed, restored backup")
-                return
-
-            # Compare versions
-            new_packages = self.get_installed_packages()
+            pip_version = self._get_pip_version()
+            args = [
+                "install", "-r", str(self.requirements_file), "--upgrade", "--quiet",
+            ]
+            if pip_version >= (22, 1):
+                args.append("--root-user-action=ignore")
+            with tempfile.TemporaryDirectory() as report_dir:
+                # pip 22.2+ can list what it installed, so the environment
+                # doesn't have to be scanned again afterwards
+                report_file = Path(report_dir) / "report.json"
+                if pip_version >= (22, 2):
+                    args += ["--report", str(report_file)]
+
+                if self.in_process and self._requires_pip():
+                    # pip can't safely replace itself while loaded in this process
+                    logging.info("Requirements include pip, upgrading in a subprocess")
+                    result = self._run_pip_subprocess(args)
+                else:
+                    result = self.run_pip_command(args)
+                if isinstance(result, subprocess.CalledProcessError):
+                    self._restore_backup(backup_file)
+                    logging.error("Package upgrade failed, restored backup")
+                    return
+
+                # Compare versions
+                new_packages = self._read_install_report(report_file, old_packages)
             self._report_changes(old_packages, new_packages, skipped_packages)
 
         except Exception as e:
             logging.error(f"Error during upgrade process: {e}")
             raise
 
+    def _requires_pip(self) -> bool:
+        """Check whether the requirements file lists pip itself."""
+        with open(self.requirements_file, "r") as file:
+            return bool(_PIP_REQ_RE.search(file.read()))
+
     def _simulate_upgrades(self, current_packages: Dict[str, str], 
-                          skipped_packages: List[str]) -> None:
+                          skipped_packages: FrozenSet[str]) -> None:
         """
         Shows what would change without making changes.
         
@@ -255,47 +453,163 @@ class PipUpgrader:
             - Current and new versions
         """
         logging.info("Checking for available upgrades...")
-        for package, version in current_packages.items():
-            if package not in skipped_packages:
-                result = self.run_pip_command(f"pip index versions {package}")
-                if not isinstance(result, subprocess.CalledProcessError):
-                    logging.info(f"Would upgrade {package} from {version}")
+        if self._get_pip_version() >= (22, 2):
+            upgrades = self._find_upgrades_with_pip(skipped_packages)
+        else:
+            logging.info("pip --dry-run not available, asking PyPI instead")
+            upgrades = self._find_upgrades_on_pypi(current_packages, skipped_packages)
+
+        for package, latest in upgrades.items():
+            version = current_packages.get(package)
+            if version and latest != version and package not in skipped_packages:
+                logging.info(f"Would upgrade {package} from {version} to {latest}")
+
+    def _find_upgrades_with_pip(
+        self, skipped_packages: FrozenSet[str]
+    ) -> Dict[str, str]:
+        """
+        Let pip's resolver work out every upgrade in one dry run.
+
+        Needs pip 22.2 or newer.
+
+        Args:
+            skipped_packages (FrozenSet[str]): Packages to not update
+
+        Returns:
+            Dict[str, str]: Packages and the versions pip would install
+
+        Raises:
+            RuntimeError: If pip could not resolve the requirements
+        """
+        # Work on a copy next to the original so "-r" includes still resolve
+        with open(self.requirements_file, "r") as file:
+            with tempfile.NamedTemporaryFile(
+                "w", suffix=".txt", dir=self.requirements_file.parent, delete=False
+            ) as tmp:
+                try:
+                    for line in file:
+                        line = self._rewrite_requirement(line, skipped_packages)
+                        tmp.write(line + '\n')
+                except Exception:
+                    tmp.close()
+                    os.remove(tmp.name)
+                    raise
+        try:
+            result = self.run_pip_command(
+                ["install", "--dry-run", "--upgrade", "-r", tmp.name]
+            )
+        finally:
+            os.remove(tmp.name)
+
+        if isinstance(result, subprocess.CalledProcessError):
+            lines = (result.stderr or "").strip().splitlines()
+            reason = lines[-1] if lines else f"exit status {result.returncode}"
+            raise RuntimeError(f"pip could not resolve the requirements: {reason}")
+
+        upgrades = {}
+        match = _WOULD_INSTALL_RE.search(result.stdout)
+        if match:
+            for item in match.group(1).split():
+                package, _, version = item.rpartition("-")
+                upgrades[package.lower()] = version
+        return upgrades
+
+    def _find_upgrades_on_pypi(
+        self, current_packages: Dict[str, str], skipped_packages: FrozenSet[str]
+    ) -> Dict[str, str]:
+        """
+        Look up the newest version of each installed package on PyPI.
+
+        Args:
+            current_packages (Dict[str, str]): Installed packages and versions
+            skipped_packages (FrozenSet[str]): Packages to not update
+
+        Returns:
+            Dict[str, str]: Packages and their latest versions
+        """
+        packages = [
+            package for package in current_packages
+            if package not in skipped_packages
+        ]
+        # Lookups are network-bound, so run them side by side
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            latest_versions = executor.map(self._get_latest_version, packages)
+            return {
+                package: latest
+                for package, latest in zip(packages, latest_versions)
+                if latest
+            }
+
+    def _get_latest_version(self, package: str) -> Optional[str]:
+        """
+        Ask PyPI for the newest version of a package.
+
+        Args:
+            package (str): Package name
+
+        Returns:
+            Optional[str]: Latest version, or None if the lookup failed
+        """
+        url = f"https://pypi.org/pypi/{package}/json"
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                return json.load(response)["info"]["version"]
+        except Exception as e:
+            logging.debug(f"Could not look up {package}: {e}")
+            return None
 
     def _restore_backup(self, backup_file: str) -> None:
         """Restore from backup file if upgrade fails."""
         try:
-            import shutil
-            shutil.copy2(backup_file, self.requirements_file)
+            self._copy_file(backup_file, self.requirements_file)
             logging.info("Restored requirements.txt from backup")
         except Exception as e:
             logging.error(f"Failed to restore backup: {e}")
 
-    def _process_requirements(self, skipped_packages: List[str]) -> None:
+    def _process_requirements(self, skipped_packages: FrozenSet[str]) -> None:
         """Process and update requirements file."""
-        with open(self.requirements_file, "r") as file:
-            requirements = file.readlines()
-
-        with open(self.requirements_file, "w") as file:
-            for line in requirements:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    file.write(line + '\n')
-                    continue
-                    
-                if '==' in line:
-                    package_name = line.split('==')[0].lower()
-                    if package_name in skipped_packages:
-                        file.write(line + '\n')
-                    else:
-                        file.write(line.replace("==", ">=") + '\n')
-                else:
-                    file.write(line + '\n')
+        # Write to a temp file and swap it in, so a crash never leaves
+        # a half-written requirements file behind
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=".txt", dir=self.requirements_file.parent, delete=False
+        ) as tmp:
+            try:
+                with open(self.requirements_file, "r") as file:
+                    for line in file:
+                        line = self._rewrite_requirement(line, skipped_packages)
+                        tmp.write(line + '\n')
+            except Exception:
+                tmp.close()
+                os.remove(tmp.name)
+                raise
+        shutil.copymode(self.requirements_file, tmp.name)
+        os.replace(tmp.name, self.requirements_file)
+
+    def _rewrite_requirement(
+        self, line: str, skipped_packages: FrozenSet[str]
+    ) -> str:
+        """
+        Loosen a pinned requirement so it can be upgraded.
+
+        Args:
+            line (str): Line from the requirements file
+            skipped_packages (FrozenSet[str]): Packages to keep pinned
+
+        Returns:
+            str: The line with "==" changed to ">=", unless it is skipped
+        """
+        comment, name, extras, version, other = _REQ_LINE_RE.match(line).groups()
+        if name is None:
+            return comment if comment is not None else other
+
+        operator = "==" if name.lower() in skipped_packages else ">="
+        return f"{name}{extras}{operator}{version}"
 
     def _report_changes(
         self,
         old_packages: Dict[str, str],
         new_packages: Dict[str, str],
-        skipped_packages: List[str],
+        skipped_packages: FrozenSet[str],
     ) -> None:
         """
         Report package version changes.
@@ -303,20 +617,19 @@ class PipUpgrader:
         Args:
             old_packages (Dict[str, str]): Original package versions
             new_packages (Dict[str, str]): New package versions
-            skipped_packages (List[str]): Packages that were skipped
+            skipped_packages (FrozenSet[str]): Packages that were skipped
         """
-        updates = []
+        any_updates = False
         for package, old_version in old_packages.items():
-            if package in new_packages and package not in skipped_packages:
-                new_version = new_packages[package]
-                if old_version != new_version:
-                    updates.append(f"{package}: {old_version} -> {new_version}")
-
-        if updates:
-            logging.info("Updated packages:")
-            for update in updates:
-                logging.info(update)
-        else:
+            new_version = new_packages.get(package)
+            if (new_version and new_version != old_version
+                    and package not in skipped_packages):
+                if not any_updates:
+                    logging.info("Updated packages:")
+                    any_updates = True
+                logging.info(f"{package}: {old_version} -> {new_version}")
+
+        if not any_updates:
             logging.info("No packages were updated.")
 
 
@@ -327,7 +640,8 @@ def main():
         subprocess.run(
             [sys.executable, "-m", "pip", "--version"],
             check=True,
-            capture_output=True
+            capture_output=True,
+            close_fds=False
         )
     except subprocess.CalledProcessError:
         print("pip is not installed. Please install pip first.")
@@ -345,6 +659,9 @@ def main():
     parser.add_argument("--skip-pip", action="store_true", help="Skip pip self-upgrade")
     parser.add_argument("--dry-run", action="store_true", 
                        help="Show proposed changes without executing them")
+    parser.add_argument("--in-process", action="store_true",
+                       help="Run pip inside this script instead of as a separate "
+                            "process (faster, relies on pip internals)")
 
     args = parser.parse_args()
 
@@ -352,7 +669,8 @@ def main():
         upgrader = PipUpgrader(
             requirements_file=args.requirements,
             quiet=args.quiet,
-            dry_run=args.dry_run
+            dry_run=args.dry_run,
+            in_process=args.in_process
         )
 
         if not args.skip_pip and not args.dry_run: